@@ -55,13 +55,16 @@
     created 01 Aug 2024
     by Maximilian Stephan for Auxspace eV.
 """
+import asyncio
+import errno
 import os
 import time
 
-import adafruit_sdcard
 import board
 import busio
 import digitalio
+import keypad
+import sdcardio
 import storage
 import wifi
 
@@ -75,8 +78,8 @@ from micropython import const  # type: ignore
 # Soft access point configuration
 NET_SSID: str = os.getenv("CIRCUITPY_WIFI_SSID", "AUXSPACE")
 NET_PW: str = os.getenv("CIRCUITPY_WIFI_PASSWORD", "wifipassword")
-NET_MAX_CON: const[int] = const(2)
-NET_PORT: const[int] = const(80)
+_NET_MAX_CON = const(2)
+_NET_PORT = const(80)
 
 # SPI configuration
 SPI_SCK: const = board.GP2
@@ -86,6 +89,7 @@ SPI_MOSI: const = board.GP3
 # I2C configuration
 I2C_RX: const = board.GP16
 I2C_SCL: const = board.GP17
+_I2C_LOCK_RETRIES = const(1000)  # 1 ms per retry
 
 # UART configuration
 UART_TX: const = board.GP12
@@ -95,116 +99,222 @@ UART_RX: const = board.GP13
 MICROSD_CS: const = board.GP1
 MICROSD_CD: const = board.GP15
 MICROSD_DEL: const = board.GP14
+# The card is initialized at a low rate, data is transferred at this rate.
+_MICROSD_BAUDRATE = const(25_000_000)
 
 MICROSD_CD_PIN: digitalio.DigitalInOut = digitalio.DigitalInOut(MICROSD_CD)
-MICROSD_DEL_PIN: digitalio.DigitalInOut = digitalio.DigitalInOut(MICROSD_DEL)
+# MICROSD_DEL is scanned in the background and reports press events.
+# countio is not an option here, since it requires a PWM B channel pin
+# on the RP2040.
+MICROSD_DEL_KEYS: keypad.Keys = keypad.Keys(
+    (MICROSD_DEL,), value_when_pressed=True, pull=True
+)
+_MICROSD_DEL_EVENT: keypad.Event = keypad.Event()
 
 # BNO08x configuration
-BNO08X_I2C_ADDR: const[int] = const(0x4a)
+_BNO08X_I2C_ADDR = const(0x4a)
 
 # Configure FS
-_SD_ROOT: const[str] = const("/sd")
-_DATA_FILE: const[str] = const("data.txt")
-_LOG_FILE: const[str] = const("run.log")
-_ERR_FILE: const[str] = const("error.log")
+# const() is only folded for integers, so plain strings are used here
+_SD_ROOT: str = "/sd"
+_DATA_FILE: str = "data.txt"
+_LOG_FILE: str = "run.log"
+_ERR_FILE: str = "error.log"
+_DATA_OFF_FILE: str = "data.off"
 
-DATAPATH: str = _SD_ROOT + "/" + _DATA_FILE
-LOGPATH: str = _SD_ROOT + "/" + _LOG_FILE
-ERRPATH: str = _SD_ROOT + "/" + _ERR_FILE
+_SD_ROOT_SLASH: str = _SD_ROOT + "/"
+
+DATAPATH: str = _SD_ROOT_SLASH + _DATA_FILE
+LOGPATH: str = _SD_ROOT_SLASH + _LOG_FILE
+ERRPATH: str = _SD_ROOT_SLASH + _ERR_FILE
+DATAOFFPATH: str = _SD_ROOT_SLASH + _DATA_OFF_FILE
+
+# Cached files in _SD_ROOT as returned by _scan_directory().
+# Marked dirty whenever files get created or removed and periodically,
+# since the file sizes change.
+_DIR_LISTING: list[tuple[str, int, bool, int]] = []
+_dir_dirty: bool = True
+
+# Data file write buffering.
+# Lines are collected in RAM and written to the SD card in whole blocks,
+# so a single sample does not cause a block read-modify-write on the card.
+_DATA_BLOCK_SIZE = const(512)
+_DATA_BATCH_MAX = const(256)  # max. bytes of one sensor cycle
+
+# The data file is created with this size, so the FAT clusters are
+# allocated once instead of while logging. The number of valid bytes in
+# the data file is kept in _DATA_OFF_FILE as a fixed width record, which
+# is overwritten in place.
+_DATA_PREALLOC_SIZE = const(4 * 1024 * 1024)
+_DATA_OFF_WIDTH = const(10)  # decimal digits
+
+# Webserver file download chunk size
+_STREAM_CHUNK_SIZE = const(4096)
+# Time a client may not accept any data before its connection is dropped
+_SEND_TIMEOUT_MS = const(2_000)
+
+# Interval in which buffered data and log lines are written to the SD card.
+_FLUSH_INTERVAL = const(5)  # seconds
+
+# Interval between two sensor readouts. The other tasks run in between.
+_SENSOR_PERIOD_MS = const(0)
+
+
+# Names of the LogLevel and SensorType values, indexed by value
+_LEVEL_NAMES: tuple[str, ...] = ("DEBUG", "INFO", "WARN", "ERROR")
+# Sensor names as used for the InfluxDB measurement
+_SENSOR_NAMES: tuple[bytes, ...] = (b"bno08x", b"dps310")
 
 
 # Enums are not featured in circuitpython
 class LogLevel:
     """Levels for the file, UART and STDOUT logger."""
-    DEBUG: const[int] = const(0)
-    INFO: const[int] = const(1)
-    WARN: const[int] = const(2)
-    ERROR: const[int] = const(3)
+    DEBUG = const(0)
+    INFO = const(1)
+    WARN = const(2)
+    ERROR = const(3)
 
     @staticmethod
-    def get_name(level: const[int]) -> str:
-        # matching is a feature of python 3.10;
-        # circuitpython 9 does not feature it yet.
-        if level == LogLevel.DEBUG:
-            return "DEBUG"
-        if level == LogLevel.ERROR:
-            return "ERROR"
-        if level == LogLevel.WARN:
-            return "WARN"
-        if level == LogLevel.INFO:
-            return "INFO"
+    def get_name(level: int) -> str:
+        if 0 <= level < len(_LEVEL_NAMES):
+            return _LEVEL_NAMES[level]
         log(LogLevel.WARN, f"Log level {level} is unknown.")
         return "UNKNOWN"
 
 
+# Messages below this level are discarded by log()
+LOG_LEVEL: int = LogLevel.DEBUG
+try:
+    LOG_LEVEL = int(os.getenv("METER_LOG_LEVEL", LogLevel.DEBUG))
+except (TypeError, ValueError) as e:
+    # log() cannot be used yet, since the level is not known
+    print("METER_LOG_LEVEL must be an integer, using DEBUG: ", e)
+# Higher levels would discard ERROR messages as well
+if not LogLevel.DEBUG <= LOG_LEVEL <= LogLevel.ERROR:
+    print("METER_LOG_LEVEL is out of range: ", LOG_LEVEL)
+    LOG_LEVEL = min(max(LOG_LEVEL, LogLevel.DEBUG), LogLevel.ERROR)
+
+
 # Enums are not featured in circuitpython
 class SensorType:
     """Sensor types of this application."""
-    BNO08X: const[int] = const(0)
-    DPS310: const[int] = const(1)
+    BNO08X = const(0)
+    DPS310 = const(1)
 
     @staticmethod
-    def get_name(sensor_type: const[int]) -> str:
-        # matching is a feature of python 3.10;
-        # circuitpython 9 does not feature it yet.
-        if sensor_type == SensorType.BNO08X:
-            return "bno08x"
-        if sensor_type == SensorType.DPS310:
-            return "dps310"
+    def get_name(sensor_type: int) -> bytes:
+        if 0 <= sensor_type < len(_SENSOR_NAMES):
+            return _SENSOR_NAMES[sensor_type]
         log(LogLevel.ERROR, f"Sensor type {sensor_type} is unknown.")
-        return "unknown"
+        return b"unknown"
+
+
+def _buf_write(buf: memoryview, off: int, data: bytes) -> int:
+    """Copy data into a buffer.
+
+    Args:
+        buf (memoryview): Buffer to write to
+        off (int): Offset in buf to write data at
+        data (bytes): Data to write
+
+    Raises:
+        ValueError: If data does not fit into buf.
+
+    Returns:
+        int: Offset in buf behind the written data.
+    """
+    end: int = off + len(data)
+    buf[off:end] = data
+    return end
+
+
+def _write_fields(
+    buf: memoryview,
+    off: int,
+    keys: tuple[bytes, ...],
+    values: tuple,
+    scale: int = 0,
+) -> int:
+    """Write InfluxDB line protocol fields into a buffer.
+
+    Args:
+        buf (memoryview): Buffer to write to
+        off (int): Offset in buf to write the fields at
+        keys (tuple[bytes, ...]): Field keys including the "=" and, except
+            for the first key, the leading ","
+        values (tuple): Field values in the same order as keys
+        scale (int): If set, the values are multiplied by scale and written
+            as InfluxDB integers. Otherwise they are written as floats.
+            Defaults to 0.
+
+    Returns:
+        int: Offset in buf behind the written fields.
+    """
+    for key, value in zip(keys, values):
+        off = _buf_write(buf, off, key)
+        if scale:
+            # Fixed point integers skip the expensive float formatting
+            off = _buf_write(buf, off, str(round(value * scale)).encode())
+            off = _buf_write(buf, off, b"i")
+        else:
+            # "%g" is faster than str() and keeps 6 significant digits
+            off = _buf_write(buf, off, ("%g" % value).encode())
+    return off
 
 
 class _SensorBase:
     """Base class representing relevant data from sensors."""
 
     # @abstractmethod is not featured in circuitpython
-    def get_data(self) -> dict[str, float]:
-        """Data getter for the influxDB line protocol.
+    def write_fields(self, buf: memoryview, off: int) -> int:
+        """Write the fields for the influxDB line protocol into a buffer.
+
+        Args:
+            buf (memoryview): Buffer to write to
+            off (int): Offset in buf to write the fields at
 
         Returns:
-            dict[str, float]: A dictionary with sensor data names and values
+            int: Offset in buf behind the written fields.
         """
         raise NotImplementedError("Abstract function has to be implemented.")
 
 
 # @dataclass is not featured in circuitpython
 class Bno08xData(_SensorBase):
-    """Class representing relevant data from the Adafruit bno08x sensor."""
+    """Class representing relevant data from the Adafruit bno08x sensor.
+    The acceleration is written as integer in mm/s^2.
+    """
+
+    _FIELDS: tuple[bytes, ...] = (b"accel_x=", b",accel_y=", b",accel_z=")
 
     def __init__(self, bno08x: BNO08X_I2C) -> None:
         self.bno08x: BNO08X_I2C = bno08x
 
-    def get_data(self) -> dict[str, float]:
-        data_dict = {
-            "accel_x": 0,
-            "accel_y": 0,
-            "accel_z": 0,
-        }
+    def write_fields(self, buf: memoryview, off: int) -> int:
         acceleration = self.bno08x.acceleration
-        if acceleration:
-            accel_x, accel_y, accel_z = acceleration
-            data_dict["accel_x"] = accel_x
-            data_dict["accel_y"] = accel_y
-            data_dict["accel_z"] = accel_z
-        else:
+        if not acceleration:
             log(LogLevel.ERROR, "Could not get acceleration data from bno08x.")
-        return data_dict
+            acceleration = (0, 0, 0)
+        return _write_fields(buf, off, self._FIELDS, acceleration, 1_000)
+
 
-^
 # @dataclass is not featured in circuitpython
 class DPS310Data(_SensorBase):
     """Class representing relevant data from the Adafruit dps310 sensor."""
 
+    _FIELDS: tuple[bytes, ...] = (b"pressure=", b",temp=")
+
     def __init__(self, dps310: DPS310) -> None:
         self.dps310: DPS310 = dps310
 
-    def get_data(self) -> dict[str, float]:
+    def write_fields(self, buf: memoryview, off: int) -> int:
         # TODO: find out what data we need
-        return {
-            "pressure": self.dps310.pressure,
-            "temp": self.dps310.temperature,
-        }
+        return _write_fields(
+            buf,
+            off,
+            self._FIELDS,
+            (self.dps310.pressure, self.dps310.temperature),
+        )
 
 
 # @dataclass is not featured in circuitpython
@@ -224,26 +334,29 @@ class SensorData:
         self.data: _SensorBase = data
         self.timestamp: int = timestamp
 
-    def to_influx_line(self) -> str | None:
-        """Create a valid line in InfluxDB Line protocol from the SensorData.
-        Note: This string ends with the timestamp, not a newline!
+    def write_line(self, buf: memoryview, off: int) -> int:
+        """Write a valid line in InfluxDB Line protocol into a buffer.
+        Note: The line is terminated with "\\r\\n".
+
+        Args:
+            buf (memoryview): Buffer to write to
+            off (int): Offset in buf to write the line at
+
+        Raises:
+            ValueError: If the line does not fit into buf.
 
         Returns:
-            str: If the sensor data is compatible with the protocol.
-            None: If the sensor data is incompatible with the protocol.
+            int: Offset in buf behind the written line.
         """
         # https://docs.influxdata.com/influxdb/cloud/reference/syntax/line-protocol/
         # <measurement>[,<tags>] <fields> <timestamp>
         # We don't use tags here, since we only have numerical data
-        measurement = SensorType.get_name(self.sensor_type)
-        _field_data: dict[str, float] = self.data.get_data()
-        _field_substrings: list[str] = [
-            f"{key}={value}"
-            for key, value in _field_data.items()
-        ]
-        fields: str = ",".join(_field_substrings)
-
-        return f"{measurement} {fields} {self.timestamp}"
+        off = _buf_write(buf, off, SensorType.get_name(self.sensor_type))
+        off = _buf_write(buf, off, b" ")
+        off = self.data.write_fields(buf, off)
+        off = _buf_write(buf, off, b" ")
+        off = _buf_write(buf, off, str(self.timestamp).encode())
+        return _buf_write(buf, off, b"\r\n")
 
 
 # Initialize UART this early to make sure it exists in log()
@@ -259,6 +372,49 @@ except Exception as e:
     print(f"Could not initialize UART: ", e)
 
 
+# Handles of run.log and error.log, which stay open for the lifetime
+# of the program. See log().
+_LOGF = None
+_ERRF = None
+
+
+def open_logfiles():
+    """Open the log files for appending, if they are not open yet."""
+    global _LOGF, _ERRF, _dir_dirty
+    if _LOGF is None:
+        _LOGF = open(LOGPATH, "ab")
+        _dir_dirty = True
+    if _ERRF is None:
+        _ERRF = open(ERRPATH, "ab")
+        _dir_dirty = True
+
+
+def flush_logfiles():
+    """Write all buffered log messages to the log files."""
+    try:
+        if _LOGF is not None:
+            _LOGF.flush()
+        if _ERRF is not None:
+            _ERRF.flush()
+    except OSError as e:
+        print("Could not flush log files: ", e)
+        # Reopen the files on the next log message
+        close_logfiles()
+
+
+def close_logfiles():
+    """Flush and close the log files, e.g. before they get removed."""
+    global _LOGF, _ERRF
+    for logfile in (_LOGF, _ERRF):
+        if logfile is not None:
+            try:
+                logfile.close()
+            except OSError:
+                pass
+    _LOGF = None
+    _ERRF = None
+
+
 def log(level: LogLevel = LogLevel.INFO, *message: str):
     """Log a message to the log file, UART and "STDOUT".
 
@@ -266,23 +422,30 @@ def log(level: LogLevel = LogLevel.INFO, *message: str):
         level (LogLevel): Level of the log message. Defaults to LogLevel.INFO
         message (tuple[str, ...]): Message(s) to log. Defaults to "".
     """
-    str_message: str = ""
+    if level < LOG_LEVEL:
+        return
+
+    header: str = ""
     logfile_path: str = LOGPATH
 
     # Only use logging format, if the message is not empty
     if message:
-        # Combine all strings to one
-        str_message = "".join([m for m in message])
-
-        # Append a timestamp. This does not have to be this accurate
-        _timestamp: int = int(time.monotonic() * 1_000)
-        _level_name: str = LogLevel.get_name(level)
-        str_message = f"[{_level_name}] - [{_timestamp}]: {str_message}"
-
-    print(str_message)
+        # Prepend a timestamp. This does not have to be this accurate
+        _timestamp: int = time.monotonic_ns() // 1_000_000
+        header = "[%s] - [%d]: " % (LogLevel.get_name(level), _timestamp)
+
+    # The header and message parts are written one after another instead
+    # of being combined first. Circuitpython streams also accept str.
+    print(header, end="")
+    for part in message:
+        print(part, end="")
+    print()
 
     if UART:
-        UART.write(str_message + "\r\n")
+        UART.write(header)
+        for part in message:
+            UART.write(part)
+        UART.write(b"\r\n")
 
     # Debug messages are not written to the file.
     if level == LogLevel.DEBUG:
@@ -291,60 +454,107 @@ def log(level: LogLevel = LogLevel.INFO, *message: str):
         logfile_path = ERRPATH
 
     try:
-        with open(logfile_path, "a") as logfile:
-            logfile.write(str_message + "\r\n")
+        open_logfiles()
+        logfile = _ERRF if level == LogLevel.ERROR else _LOGF
+        logfile.write(header)
+        for part in message:
+            logfile.write(part)
+        logfile.write(b"\r\n")
+
+        # Warnings and errors should never get lost in the file buffer.
+        # Everything else is flushed periodically by flush_task().
+        if level >= LogLevel.WARN:
+            logfile.flush()
     except FileNotFoundError:
         print(f"Could not open file {logfile_path}: File not found.")
     except IOError as e:
         print(f"Could not write to {logfile_path}: ", e)
+        # Reopen the files on the next log message
+        close_logfiles()
     except Exception as e:
         print(f"Writing to {logfile_path} failed: ",e)
 
 
-def _print_directory(path: str, tabs: int = 0, use_logger: bool = False):
-    """Pretty print files in a directory.
+def _scan_directory(
+    path: str,
+    depth: int = 0,
+    entries: list[tuple[str, int, bool, int]] | None = None,
+) -> list[tuple[str, int, bool, int]]:
+    """Recursively collect the files in a directory.
 
     Args:
-        path (str): Path of the directory to print
-        tabs (int): Number of tabs to display. Defaults to 0.
+        path (str): Path of the directory to scan
+        depth (int): Depth of path below the scanned root. Defaults to 0.
+        entries (list[tuple[str, int, bool, int]] | None): List to append
+            the files to. Defaults to None.
+
+    Returns:
+        list[tuple[str, int, bool, int]]: Name, size in bytes, directory
+            flag and depth of each file.
     """
+    if entries is None:
+        entries = []
     for file in os.listdir(path):
         if file == "?":
             continue  # Issue noted in Learn
-        stats = os.stat(path + "/" + file)
-        filesize = stats[6]
-        isdir = stats[0] & 0x4000
-
-        if filesize < 1_000:
-            sizestr = str(filesize) + " by"
-        elif filesize < 1_000_000:
-            sizestr = f"{round(filesize / 1_000, 2)} KB"
-        else:
-            sizestr = f"{round(filesize / 1_000_000, 2)} MB"
+        file_path: str = path + "/" + file
+        stats = os.stat(file_path)
+        filesize: int = stats[6]
+        isdir: bool = bool(stats[0] & 0x4000)
+        # The preallocated data file is only valid up to its offset
+        if file_path == DATAPATH and _data_file_off >= 0:
+            filesize = _data_file_off
+        entries.append((file, filesize, isdir, depth))
+
+        # recursively collect directory contents
+        if isdir:
+            _scan_directory(file_path, depth + 1, entries)
+    return entries
+
+
+def _format_size(filesize: int) -> str:
+    """Format a file size for humans.
+
+    Args:
+        filesize (int): Size in bytes
+
+    Returns:
+        str: Size with unit
+    """
+    if filesize < 1_000:
+        return str(filesize) + " by"
+    if filesize < 1_000_000:
+        return f"{round(filesize / 1_000, 2)} KB"
+    return f"{round(filesize / 1_000_000, 2)} MB"
+
+
+def _print_directory(
+    entries: list[tuple[str, int, bool, int]], use_logger: bool = False
+):
+    """Pretty print files in a directory.
 
-        prettyprintname = ""
-        for _ in range(tabs):
-            prettyprintname += "   "
-        prettyprintname += file
+    Args:
+        entries (list[tuple[str, int, bool, int]]): Files as returned by
+            _scan_directory()
+        use_logger (bool): Use log() instead of print(). Defaults to False.
+    """
+    for file, filesize, isdir, depth in entries:
+        prettyprintname: str = "   " * depth + file
         if isdir:
             prettyprintname += "/"
-        file_str: str = (
-            '{0:<40} Size: {1:>10}'.format(prettyprintname, sizestr)
+        file_str: str = '{0:<40} Size: {1:>10}'.format(
+            prettyprintname, _format_size(filesize)
         )
         if use_logger:
             log(LogLevel.INFO, file_str)
         else:
             print(file_str)
 
-        # recursively print directory contents
-        if isdir:
-            _print_directory(path + "/" + file, tabs + 1)
-
 
 def init_access_point():
     """Initialize wifi.radio as soft access point."""
     wifi.radio.start_ap(
-        ssid=NET_SSID, password=NET_PW, max_connections=NET_MAX_CON
+        ssid=NET_SSID, password=NET_PW, max_connections=_NET_MAX_CON
     )
     log(LogLevel.INFO, "Access point created.")
     log(LogLevel.DEBUG, f"SSID: {NET_SSID}, password: {NET_PW}")
@@ -353,6 +563,9 @@ def init_access_point():
 def init_i2c() -> busio.I2C:
     """Initialize the I2C bus.
 
+    Raises:
+        RuntimeError: If the bus cannot be locked for scanning.
+
     Returns:
         busio.I2C: reference to the RPI Pico's I2C bus interface.
     """
@@ -362,8 +575,14 @@ def init_i2c() -> busio.I2C:
     addr: list[str] = []
 
     # Get the lock before scanning
-    while not i2c.try_lock():
-        pass
+    for _ in range(_I2C_LOCK_RETRIES):
+        if i2c.try_lock():
+            break
+        time.sleep(0.001)
+    else:
+        raise RuntimeError(
+            f"Could not lock the I2C bus within {_I2C_LOCK_RETRIES} ms."
+        )
 
     try:
         # Print all addresses on the I2C bus.
@@ -386,15 +605,14 @@ def init_spi() -> busio.SPI:
     return busio.SPI(SPI_SCK, MOSI=SPI_MOSI, MISO=SPI_MISO)
 
 
-def init_microsd(spi_bus: busio.SPI) -> adafruit_sdcard.SDCard:
+def init_microsd(spi_bus: busio.SPI) -> sdcardio.SDCard:
     """Initialize the Adafruit MicroSD card breakout board+ via SPI.
 
     Args:
         spi_bus (busio.SPI): SPI bus reference.
 
     Returns:
-        adafruit_sdcard.SDCard: reference to the adafruit sdcard (SPI)
-            interface.
+        sdcardio.SDCard: reference to the sdcard (SPI) interface.
     """
     # "log" cannot be used since sd card board is not setup yet
     print("Initializing MicroSD card ...")
@@ -406,41 +624,352 @@ def init_microsd(spi_bus: busio.SPI) -> adafruit_sdcard.SDCard:
         print("Make sure to insert a MicroSD card! Trying again ...")
 
     while not MICROSD_CD_PIN.value:
-        pass
+        time.sleep(0.05)
     print("Card is connected. Establishing SPI connection ...")
 
-    sd_cs: digitalio.DigitalInOut = digitalio.DigitalInOut(MICROSD_CS)
-
-    sd_card: adafruit_sdcard.SDCard = adafruit_sdcard.SDCard(spi_bus, sd_cs)
+    # sdcardio is the native SD card driver of circuitpython and uses
+    # multi-block transfers, unlike the pure python adafruit_sdcard.
+    sd_card: sdcardio.SDCard = sdcardio.SDCard(
+        spi_bus, MICROSD_CS, baudrate=_MICROSD_BAUDRATE
+    )
     vfs: storage.VfsFat = storage.VfsFat(sd_card)  # type: ignore
 
     print(f"Mounting vfs at {_SD_ROOT}")
 
     storage.mount(vfs, _SD_ROOT)
 
+    # Mounting reads sectors at the data rate, so the bus is configured
+    # for it now. The actual rate depends on the SPI clock dividers.
+    print(f"SPI bus running at {spi_bus.frequency} Hz")
+    open_logfiles()
+    _open_datafile()
+
     print()
     print("Files on filesystem:")
     print("====================")
-    _print_directory(_SD_ROOT)
+    _print_directory(_list_sd_root())
     print()
 
     return sd_card
 
 
-def data2datafile(sensor_data: SensorData):
+# The buffer has room for one more batch of lines behind the block
+# boundary, so a line never has to be split before the block is written.
+_DATA_BUF: bytearray = bytearray(_DATA_BLOCK_SIZE + _DATA_BATCH_MAX)
+_DATA_BUF_MV: memoryview = memoryview(_DATA_BUF)
+_data_buf_off: int = 0
+# Chunk buffer for file downloads and for zero-filling the data file,
+# eight SD card blocks at a time. Requests are served one by one, so a
+# single buffer is sufficient.
+_STREAM_BUF: bytearray = bytearray(_STREAM_CHUNK_SIZE)
+_STREAM_BUF_MV: memoryview = memoryview(_STREAM_BUF)
+# Number of valid bytes in the data file, -1 if not known yet
+_data_file_off: int = -1
+_data_saved_off: int = -1
+_DATAF = None
+# Handle of _DATA_OFF_FILE, which stays open like the data file
+_OFFF = None
+
+
+def _recover_data_offset(datafile, start: int = 0) -> int:
+    """Find the end of the data in the data file.
+    The data file is zero-filled when it is created and lines never contain
+    NUL bytes, so the data ends at the first NUL byte. A partially written
+    line at the end is dropped.
+
+    Args:
+        datafile: File handle of the data file
+        start (int): Known end of a complete line to search from.
+            Defaults to 0.
+
+    Returns:
+        int: Number of valid bytes in the data file.
+    """
+    # Binary search for the first NUL byte, or the end of the file
+    low: int = start
+    high: int = datafile.seek(0, 2)
+    while low < high:
+        mid: int = (low + high) // 2
+        datafile.seek(mid)
+        if datafile.read(1) == b"\0":
+            high = mid
+        else:
+            low = mid + 1
+
+    # Continue behind the last complete line
+    start = max(low - _DATA_BATCH_MAX, start)
+    datafile.seek(start)
+    return start + datafile.read(low - start).rfind(b"\n") + 1
+
+
+def _read_data_offset(datafile) -> int:
+    """Get the number of valid bytes in the data file from _DATA_OFF_FILE.
+
+    Args:
+        datafile: File handle of the data file
+
+    Returns:
+        int: Number of valid bytes. If _DATA_OFF_FILE is missing or invalid,
+            the end of the data is recovered from the data file itself.
+    """
+    try:
+        with open(DATAOFFPATH, "rb") as offfile:
+            offset: int = int(offfile.read(_DATA_OFF_WIDTH))
+        size: int = datafile.seek(0, 2)
+        # Offsets are only saved behind complete lines
+        valid: bool = offset == 0
+        if 0 < offset <= size:
+            datafile.seek(offset - 1)
+            valid = datafile.read(1) == b"\n"
+        if valid:
+            if offset == size:
+                return offset
+            # Blocks written after the last flush are still valid data
+            datafile.seek(offset)
+            if datafile.read(1) == b"\0":
+                return offset
+            log(LogLevel.WARN, f"{DATAPATH} continues behind {offset}.")
+            return _recover_data_offset(datafile, offset)
+    except (OSError, ValueError):
+        pass
+    log(LogLevel.WARN, f"{DATAOFFPATH} is invalid. Recovering the offset.")
+    return _recover_data_offset(datafile)
+
+
+def _write_data_offset():
+    """Save the number of valid bytes in the data file to _DATA_OFF_FILE."""
+    global _OFFF, _data_saved_off
+    if _data_file_off == _data_saved_off:
+        return
+    try:
+        if _OFFF is None:
+            try:
+                _OFFF = open(DATAOFFPATH, "r+b")
+            except OSError:
+                _OFFF = open(DATAOFFPATH, "w+b")
+        # Overwrite the record in place, the file is never truncated
+        _OFFF.seek(0)
+        # Zero padded to _DATA_OFF_WIDTH digits
+        _OFFF.write(("%010d\n" % _data_file_off).encode())
+        _OFFF.flush()
+        _data_saved_off = _data_file_off
+    except OSError as e:
+        log(LogLevel.ERROR, f"Could not write to {DATAOFFPATH}: {e}")
+        close_offfile()
+
+
+def close_offfile():
+    """Close _DATA_OFF_FILE, e.g. before it gets removed."""
+    global _OFFF, _data_saved_off
+    if _OFFF is not None:
+        try:
+            _OFFF.close()
+        except OSError:
+            pass
+        _OFFF = None
+    # Write the offset again with the next flush
+    _data_saved_off = -1
+
+
+def _create_datafile():
+    """Create the data file with _DATA_PREALLOC_SIZE zero bytes.
+    Writing the whole file makes FAT allocate all clusters up front and
+    lets _recover_data_offset() find the end of the data.
+
+    Returns:
+        The file handle of the new data file.
+    """
+    global _data_file_off, _data_saved_off
+    log(
+        LogLevel.INFO,
+        f"Preallocating {_DATA_PREALLOC_SIZE} bytes for {DATAPATH}",
+    )
+    # Zero the buffer by doubling the zeroed part, without an allocation
+    _STREAM_BUF[0] = 0
+    size: int = 1
+    while size < _STREAM_CHUNK_SIZE:
+        _STREAM_BUF_MV[size:2 * size] = _STREAM_BUF_MV[:size]
+        size *= 2
+
+    datafile = open(DATAPATH, "w+b")
+    # Larger writes let the SD card driver use multi-block transfers
+    for _ in range(_DATA_PREALLOC_SIZE // _STREAM_CHUNK_SIZE):
+        datafile.write(_STREAM_BUF)
+    datafile.flush()
+    datafile.seek(0)
+    _data_file_off = 0
+    _data_saved_off = -1
+    _write_data_offset()
+    return datafile
+
+
+def _open_datafile():
+    """Open the data file at its current offset, if it is not open yet.
+    The data file is created, if it does not exist.
+
+    Returns:
+        The file handle of the data file or None if it could not be opened.
+    """
+    global _DATAF, _data_file_off, _dir_dirty
+    if _DATAF is None:
+        try:
+            try:
+                _DATAF = open(DATAPATH, "r+b")
+                if _data_file_off < 0:
+                    _data_file_off = _read_data_offset(_DATAF)
+            except OSError:
+                _DATAF = _create_datafile()
+                _dir_dirty = True
+            _DATAF.seek(_data_file_off)
+        except OSError as e:
+            log(LogLevel.ERROR, f"Could not open {DATAPATH}: {e}")
+            _DATAF = None
+    return _DATAF
+
+
+def _write_datafile(data: memoryview):
+    """Write raw data to the data file and flush it to the SD card.
+
+    Args:
+        data (memoryview): Data to write to the file.
+    """
+    global _DATAF, _data_file_off
+    datafile = _open_datafile()
+    if datafile is None:
+        return
+    try:
+        datafile.write(data)
+        datafile.flush()
+        _data_file_off += len(data)
+    except OSError as e:
+        log(LogLevel.ERROR, f"Could not write to {DATAPATH}: {e}")
+        # Reopen the file on the next write
+        _DATAF = None
+
+
+def flush_datafile():
+    """Write all buffered data lines and the offset of the data file."""
+    global _data_buf_off
+    if _data_buf_off:
+        _write_datafile(_DATA_BUF_MV[:_data_buf_off])
+    _data_buf_off = 0
+    if _DATAF is not None:
+        _write_data_offset()
+
+
+def close_datafile():
+    """Flush and close the data file, e.g. before it gets removed."""
+    global _DATAF
+    flush_datafile()
+    if _DATAF is not None:
+        try:
+            _DATAF.close()
+        except OSError:
+            pass
+        _DATAF = None
+
+
+def _release_file(path: str):
+    """Close the handle of a file that this program keeps open, if any.
+
+    Args:
+        path (str): Path of the file, e.g. before it gets removed.
+    """
+    if path == DATAPATH:
+        close_datafile()
+    elif path == DATAOFFPATH:
+        close_offfile()
+    elif path in (LOGPATH, ERRPATH):
+        close_logfiles()
+
+
+def _remove_file(path: str):
+    """Remove a file from the SD card.
+    The data file is created again right away, so it is not preallocated
+    by the next write in the middle of a sensor cycle.
+
+    Args:
+        path (str): Path of the file to remove
+
+    Raises:
+        OSError: If the file could not be removed.
+    """
+    global _data_file_off, _dir_dirty
+    _release_file(path)
+    os.remove(path)
+    _dir_dirty = True
+    if path == DATAPATH:
+        # The offset belonged to the removed file
+        _data_file_off = -1
+        _open_datafile()
+
+
+def _shift_data_buf(start: int):
+    """Move the first _data_buf_off bytes behind start to the buffer start.
+    The data is copied in chunks of at most start bytes, so source and
+    destination never overlap.
+
+    Args:
+        start (int): Offset of the data to move in the buffer
+    """
+    for dst in range(0, _data_buf_off, start):
+        src: int = start + dst
+        size: int = min(start, _data_buf_off - dst)
+        _DATA_BUF_MV[dst:dst + size] = _DATA_BUF_MV[src:src + size]
+
+
+def data2datafile(*sensor_data: SensorData):
     """Write data to the data file in InfluxDB line protocol.
 
+    The data is buffered in RAM and written to the SD card in blocks of
+    _DATA_BLOCK_SIZE bytes. The rest is flushed periodically by flush_task().
+
     Args:
-        sensor_data (SensorData): Data to write to the file.
+        sensor_data (tuple[SensorData, ...]): Data to write to the file.
     """
-    # Format sensor data to single InfluxDB Line
-    if influx_line := sensor_data.to_influx_line():
-        with open(DATAPATH, "a") as datafile:
+    global _data_buf_off
+
+    # Format sensor data to InfluxDB Lines right into the buffer.
+    # There are always at least _DATA_BATCH_MAX bytes left behind the offset.
+    end: int = _data_buf_off
+    for data in sensor_data:
+        start: int = end
+        try:
+            end = data.write_line(_DATA_BUF_MV, start)
+        except ValueError:
+            log(
+                LogLevel.ERROR,
+                f"Lines exceed {_DATA_BATCH_MAX} bytes. Dropping sensor data.",
+            )
+            return
+
+        # Do not even create the message, if it would be discarded
+        if LOG_LEVEL <= LogLevel.DEBUG:
             log(
                 LogLevel.DEBUG,
-                f"Appending '{sensor_data.to_influx_line()}' to {DATAPATH}",
+                "Appending '",
+                bytes(_DATA_BUF_MV[start:end - 2]).decode(),
+                "' to ",
+                DATAPATH,
             )
-            datafile.write(influx_line + "\r\n")
+    _data_buf_off = end
+
+    # Write up to the next block boundary of the data file. After a
+    # partial flush this is less than a block, so that all following
+    # writes are aligned to the SD card blocks again.
+    block_size: int = (
+        _DATA_BLOCK_SIZE - max(_data_file_off, 0) % _DATA_BLOCK_SIZE
+    )
+    written: int = 0
+    while _data_buf_off - written >= block_size:
+        _write_datafile(_DATA_BUF_MV[written:written + block_size])
+        written += block_size
+        block_size = _DATA_BLOCK_SIZE
+
+    if written:
+        # Keep the overhang for the next block
+        _data_buf_off -= written
+        _shift_data_buf(written)
 
 
 def init_bno08x(
@@ -457,7 +986,7 @@ def init_bno08x(
         BNO08X_I2C: Reference to the BNO08x sensor (I2C) interface.
     """
     log(LogLevel.INFO, "Initializing BNO08x sensor ...")
-    bno: BNO08X_I2C = BNO08X_I2C(i2c_bus, address=BNO08X_I2C_ADDR)
+    bno: BNO08X_I2C = BNO08X_I2C(i2c_bus, address=_BNO08X_I2C_ADDR)
     bno.enable_feature(report)
     log(LogLevel.INFO, "Done.\r\n")
 
@@ -485,74 +1014,59 @@ def handle_sd():
     This only checks if an SD Card is inserted
     and deletes the all files if the MICROSD_DEL button is pressed.
     """
-    delete_files: list[str] = [
-        LOGPATH,
-        ERRPATH,
-        DATAPATH,
-    ]
     if not MICROSD_CD_PIN.value:
         log(LogLevel.ERROR, "No MicroSD card inserted.")
 
-    if MICROSD_DEL_PIN.value:
+    # Only act once per press of MICROSD_DEL
+    if (
+        MICROSD_DEL_KEYS.events.get_into(_MICROSD_DEL_EVENT)
+        and _MICROSD_DEL_EVENT.pressed
+    ):
         log(LogLevel.INFO, "MICROSD_DEL pressed. Deleting all files.")
+        # The data file is recreated with the offset file, so it goes last
+        delete_files: list[str] = [
+            LOGPATH,
+            ERRPATH,
+            DATAOFFPATH,
+            DATAPATH,
+        ]
 
         for path in delete_files:
             try:
                 log(LogLevel.DEBUG, f"Removing file {path}.")
-                os.remove(path)
+                _remove_file(path)
             except FileNotFoundError:
                 log(LogLevel.WARN, f"File {path} does not exist.")
 
         log(LogLevel.INFO, "File deletion completed.")
 
 
-def _handle_sensor(sensor_type: SensorType, data: _SensorBase):
+def _handle_sensor(sensors: tuple[SensorData, ...], ts: int):
     """Generic handler function for sensors.
+    All sensors are sampled with the same timestamp and written to the
+    data file at once.
 
     Args:
-        sensor_type (SensorType): Type of the sensor.
-        data (_SensorBase): Sensor data
+        sensors (tuple[SensorData, ...]): Reusable data of each sensor.
+        ts (int): Time of the sensor cycle in millis
     """
-    # TODO: more accurate timestamps (optional)
-    current_time: int =  int(time.monotonic() * 1_000)
-    sensor_data: SensorData = SensorData(sensor_type, data, current_time)
-    data2datafile(sensor_data)
-
-
-def handle_bno08x(bno08x: BNO08X_I2C):
-    """Handle the BNO08x Data.
-
-    Args:
-        bno08x (BNO08X_I2C): Reference to the BNO08x sensor (I2C) interface.
-    """
-    # Get the gyro data with timestamps and write it to DB file
-    bno_data: Bno08xData = Bno08xData(bno08x)
-    _handle_sensor(SensorType.BNO08X, bno_data)
-
-
-def handle_dps310(dps310: DPS310):
-    """Handle the DPS310 Data.
-
-    Args:
-        dps310 (DPS310): Reference to the DPS310 sensor (I2C) interface.
-    """
-    # Get the temp and humidity data with timestamps and write it to DB file
-    dps_data: DPS310Data = DPS310Data(dps310)
-    _handle_sensor(SensorType.DPS310, dps_data)
+    for sensor_data in sensors:
+        sensor_data.timestamp = ts
+    data2datafile(*sensors)
 
 
 def _init_peripherals():
     """Initialize all peripherals that this program uses.
 
     Returns:
-        adafruit_sdcard.SDCard: Reference to the MicroSD (SPI) interface.
-        BNO08X_I2C: Reference to the BNO08x sensor (I2C) interface.
-        DPS310: Reference to the DPS310 sensor (I2C) interface.
+        sdcardio.SDCard: Reference to the MicroSD (SPI) interface.
+        SensorData: Reusable data of the BNO08x sensor (I2C).
+        SensorData: Reusable data of the DPS310 sensor (I2C).
     """
     # Initialize SPI at first, since the microSD card is used for
     # logging.
     spi: busio.SPI = init_spi()
-    sd_card: adafruit_sdcard.SDCard = init_microsd(spi)
+    sd_card: sdcardio.SDCard = init_microsd(spi)
 
     # Start WiFi Access point directly after
     init_access_point()
@@ -564,12 +1078,72 @@ def _init_peripherals():
 
     dps: DPS310 = init_dps310(i2c)
 
-    # Initialize MICROSD_DEL input pin
-    MICROSD_DEL_PIN.direction = digitalio.Direction.INPUT
-    MICROSD_DEL_PIN.pull = digitalio.Pull.DOWN
+    # Ignore MICROSD_DEL presses during the initialization
+    MICROSD_DEL_KEYS.events.clear()
+
+    # The sensor data objects are reused for every sample,
+    # only the timestamp is updated.
+    bno_data: SensorData = SensorData(SensorType.BNO08X, Bno08xData(bno), 0)
+    dps_data: SensorData = SensorData(SensorType.DPS310, DPS310Data(dps), 0)
 
     log(LogLevel.INFO, "Peripheral initialization complete.\r\n")
-    return sd_card, bno, dps
+    return sd_card, bno_data, dps_data
+
+
+# HTTP response headers for the raw connection handlers
+# The octet-stream header is completed with a Content-Disposition.
+_HDR_200_OCTET: bytes = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/octet-stream\r\n"
+    b"Connection: close\r\n"
+)
+_HDR_200_TEXT: bytes = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Connection: close\r\n\r\n"
+)
+_HDR_500: bytes = (
+    b"HTTP/1.1 500 Internal Server Error\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Connection: close\r\n\r\n"
+)
+
+
+def _send_all(connection, data: bytes | memoryview) -> bool:
+    """Send all data over a client connection.
+    The socket may accept less than the whole data per send() call.
+
+    Args:
+        connection: Socket of the client connection
+        data (bytes | memoryview): Data to send
+
+    Raises:
+        OSError: If sending fails for another reason than a lost client.
+
+    Returns:
+        bool: False if the client is gone or did not accept any data for
+            _SEND_TIMEOUT_MS, True otherwise.
+    """
+    view: memoryview = memoryview(data)
+    sent: int = 0
+    # Integer milliseconds, the same clock as the sensor timestamps
+    last_ms: int = time.monotonic_ns() // 1_000_000
+    while sent < len(view):
+        try:
+            sent += connection.send(view[sent:])
+            last_ms = time.monotonic_ns() // 1_000_000
+        except OSError as e:
+            if e.errno in (errno.ECONNRESET, errno.ENOTCONN):
+                log(LogLevel.WARN, "Client closed the connection.")
+                return False
+            if e.errno != errno.EAGAIN:
+                raise
+            # The send buffer is full, try again unless the client stalls.
+            # The other tasks do not run until this returns.
+            if time.monotonic_ns() // 1_000_000 - last_ms > _SEND_TIMEOUT_MS:
+                log(LogLevel.WARN, "Client stopped receiving. Aborting.")
+                return False
+    return True
 
 
 # Updated function to handle file download as a stream
@@ -580,47 +1154,49 @@ def handle_file_stream(request: Request, file_name: str):
         request (Request): Request from the client
         file_name (str): Name of the file in _SD_ROOT to be downloaded
     """
-    file_path: str= f"{_SD_ROOT}/{file_name}"
+    file_path: str = _SD_ROOT_SLASH + file_name
+    # Make sure the download contains all buffered lines
+    if file_path == DATAPATH:
+        flush_datafile()
+    elif file_path in (LOGPATH, ERRPATH):
+        flush_logfiles()
     try:
         # Open the file in binary read mode
         with open(file_path, "rb") as file:
-            request.connection.send(
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: application/octet-stream\r\n"
-                f"Content-Disposition: attachment; filename=\"{file_name}\"\r\n"
-                "Connection: close\r\n\r\n"
+            if not _send_all(
+                request.connection,
+                _HDR_200_OCTET
+                + b'Content-Disposition: attachment; filename="'
+                + file_name.encode()
+                + b'"\r\n\r\n'
+            ):
+                return
+
+            # The preallocated data file is only valid up to its offset
+            remaining: int = (
+                _data_file_off if file_path == DATAPATH
+                else os.stat(file_path)[6]
             )
 
-            while True:
-                # Read a chunk of the file (e.g., 512 bytes)
-                chunk = file.read(512)
-                if not chunk:
-                    break
-                request.connection.send(chunk)
+            # Read the file in chunks into the same buffer
+            size: int = file.readinto(_STREAM_BUF)
+            while size and remaining > 0:
+                size = min(size, remaining)
+                if not _send_all(request.connection, _STREAM_BUF_MV[:size]):
+                    return
+                remaining -= size
+                size = file.readinto(_STREAM_BUF)
 
     except Exception as e:
         # Send a 500 response if there's an error
-        request.connection.send(
-            "HTTP/1.1 500 Internal Server Error\r\n"
-            "Content-Type: text/plain\r\n"
-            "Connection: close\r\n\r\n"
-            f"Error: {str(e)}"
-        )
+        _send_all(request.connection, _HDR_500 + f"Error: {str(e)}".encode())
 
     finally:
         request.connection.close()
 
 
-def webpage():
-    text_list: list[str] = [
-        f'<li>{filename} - <a href="{_SD_ROOT}/{filename}">Download</a> - <a href="/delete/{filename}">Delete</a></li>'
-        for filename in os.listdir(_SD_ROOT)
-        if filename != "?"
-    ]
-    text_str = "<ul>" if len(text_list) > 0 else f"<p> No files to list in {_SD_ROOT}.</p>"
-    text_str += "\n".join(text_list)
-    text_str += "</ul>" if len(text_list) > 0 else ""
-    html = f"""<!DOCTYPE html>
+# Static parts of the WEBPAGE, only the file list is created per request
+_HTML_HEAD: bytes = b"""<!DOCTYPE html>
     <html>
         <head>
             <meta http-equiv="Content-type" content="text/html;charset=utf-8">
@@ -631,11 +1207,39 @@ def webpage():
             <h1>Auxspace Telemetry Interface</h1>
             <br>
             <p class="dotted">This page allows you download and delete files from the SD Card on the Telemetry device.</p>
-            {text_str}
+            """
+_HTML_TAIL: bytes = b"""
         </body>
     </html>
     """
-    return html
+
+
+def _list_sd_root() -> list[tuple[str, int, bool, int]]:
+    """Get the files in _SD_ROOT.
+    The SD card is only read again if the cached listing is dirty.
+
+    Returns:
+        list[tuple[str, int, bool, int]]: Files as returned by
+            _scan_directory()
+    """
+    global _DIR_LISTING, _dir_dirty
+    if _dir_dirty:
+        _DIR_LISTING = _scan_directory(_SD_ROOT)
+        _dir_dirty = False
+    return _DIR_LISTING
+
+
+def webpage() -> bytes:
+    # Only files directly in _SD_ROOT can be downloaded
+    text_list: list[str] = [
+        f'<li>{filename} ({_format_size(filesize)}) - <a href="{_SD_ROOT_SLASH}{filename}">Download</a> - <a href="/delete/{filename}">Delete</a></li>'
+        for filename, filesize, isdir, depth in _list_sd_root()
+        if not depth
+    ]
+    text_str = "<ul>" if len(text_list) > 0 else f"<p> No files to list in {_SD_ROOT}.</p>"
+    text_str += "\n".join(text_list)
+    text_str += "</ul>" if len(text_list) > 0 else ""
+    return _HTML_HEAD + text_str.encode() + _HTML_TAIL
 
 
 def _init_webserver() -> Server:
@@ -659,10 +1263,10 @@ def _init_webserver() -> Server:
         #  serve the HTML f string
         #  with content type text/html
         log(LogLevel.DEBUG, f"Serving main page to {request.client_address}")
-        return Response(request, f"{webpage()}", content_type='text/html')
+        return Response(request, webpage(), content_type='text/html')
 
     # Route for downloading files from the SD card
-    @server.route(f"{_SD_ROOT}/<filename>")
+    @server.route(_SD_ROOT_SLASH + "<filename>")
     def download_file(request: Request, filename: str):
         """Serve a file from the SD card as a download.
 
@@ -682,25 +1286,23 @@ def _init_webserver() -> Server:
             request (Request): Request from the client
             filename (str): Name of the file to be deleted
         """
-        file_path: str = f"{_SD_ROOT}/{filename}"
+        file_path: str = _SD_ROOT_SLASH + filename
         try:
-            os.remove(file_path)
+            _remove_file(file_path)
             log(LogLevel.INFO, f"File {file_path} deleted.")
 
             # Send a success response
-            request.connection.send(
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: text/plain\r\n"
-                "Connection: close\r\n\r\n"
-                f"File '{filename}' deleted successfully."
+            _send_all(
+                request.connection,
+                _HDR_200_TEXT
+                + f"File '{filename}' deleted successfully.".encode()
             )
         except Exception as e:
             # Send a 500 response if there's an error
-            request.connection.send(
-                "HTTP/1.1 500 Internal Server Error\r\n"
-                "Content-Type: text/plain\r\n"
-                "Connection: close\r\n\r\n"
-                f"Error deleting file '{filename}': {str(e)}"
+            _send_all(
+                request.connection,
+                _HDR_500
+                + f"Error deleting file '{filename}': {str(e)}".encode()
             )
         finally:
             # Close the connection after handling the request
@@ -708,46 +1310,90 @@ def _init_webserver() -> Server:
     return server
 
 
-def loop(sd: adafruit_sdcard.SDCard, bno: BNO08X_I2C, dps: DPS310):
+def loop(sd: sdcardio.SDCard, bno_data: SensorData, dps_data: SensorData):
     """Arduino-like loop function.
     Endlessly gets looped in intervalls.
 
     Args:
-        sd (adafruit_sdcard.SDCard): Reference to the MicroSD (SPI) interface.
-        bno (BNO08X_I2C): Reference to the BNO08x sensor (I2C) interface.
-        dps (DPS310): Reference to the DPS310 sensor (I2C) interface.
+        sd (sdcardio.SDCard): Reference to the MicroSD (SPI) interface.
+        bno_data (SensorData): Reusable data of the BNO08x sensor (I2C).
+        dps_data (SensorData): Reusable data of the DPS310 sensor (I2C).
     """
     handle_sd()
-    # Handle sensors one by one.
+    # Handle sensors in one batch.
     # TODO: Upgrade this to event-based data gathering in the future.
-    handle_dps310(dps)
-    handle_bno08x(bno)
+    # TODO: more accurate timestamps (optional)
+    # Integer arithmetic avoids software floating point on the RP2040.
+    current_time: int = time.monotonic_ns() // 1_000_000
+    _handle_sensor((dps_data, bno_data), current_time)
+
+
+async def sensor_task(
+    sd: sdcardio.SDCard, bno_data: SensorData, dps_data: SensorData
+):
+    """Periodically run loop() to collect the sensor data.
+
+    Args:
+        sd (sdcardio.SDCard): Reference to the MicroSD (SPI) interface.
+        bno_data (SensorData): Reusable data of the BNO08x sensor (I2C).
+        dps_data (SensorData): Reusable data of the DPS310 sensor (I2C).
+    """
+    while True:
+        try:
+            loop(sd, bno_data, dps_data)
+        # I know this is too broad, but currently its necessary for fail-safety
+        except Exception as e:
+            log(LogLevel.ERROR, f"Unexpected Error occured in sensor task: {e}")
+        await asyncio.sleep_ms(_SENSOR_PERIOD_MS)
 
 
-def main():
+async def server_task(server: Server):
+    """Serve HTTP requests in between the other tasks.
+
+    Args:
+        server (Server): Started webserver
+    """
+    while True:
+        try:
+            server.poll()
+        # I know this is too broad, but currently its necessary for fail-safety
+        except Exception as e:
+            log(LogLevel.ERROR, f"Unexpected Error occured in server task: {e}")
+        await asyncio.sleep(0)
+
+
+async def flush_task():
+    """Periodically write buffered data and log lines to the SD card."""
+    global _dir_dirty
+    while True:
+        await asyncio.sleep(_FLUSH_INTERVAL)
+        flush_datafile()
+        flush_logfiles()
+        # File sizes have changed, list them again on the next request
+        _dir_dirty = True
+
+
+async def main():
     """Main entrypoint of the circuitpython telemetry program."""
     # Initialize peripherals at first (comparable to arduino setup())
-    sd, bno, dps = _init_peripherals()
+    sd, bno_data, dps_data = _init_peripherals()
     server: Server = _init_webserver()
     ip = str(wifi.radio.ipv4_address_ap)
 
     try:
-        server.start(ip, NET_PORT)
-        log(LogLevel.INFO, f"Serving default WEBPAGE at {ip}:{NET_PORT}")
+        server.start(ip, _NET_PORT)
+        log(LogLevel.INFO, f"Serving default WEBPAGE at {ip}:{_NET_PORT}")
     # I know this is too broad, but currently its necessary for fail-safety
     except Exception as e:
         log(LogLevel.ERROR, f"Unexpected Error occured in main function: {e}")
 
-    while True:
-
-        try:
-            server.poll()
-            loop(sd, bno, dps)
-        # I know this is too broad, but currently its necessary for fail-safety
-        except Exception as e:
-            log(LogLevel.ERROR, f"Unexpected Error occured in main function: {e}")
+    await asyncio.gather(
+        sensor_task(sd, bno_data, dps_data),
+        server_task(server),
+        flush_task(),
+    )
 
 
 # Entrypoint
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -16,6 +16,15 @@ fi
 
 THISDIR=`dirname $SCR_DIR`
 
+# METER_LOG_LEVEL has to be one of 0: DEBUG, 1: INFO, 2: WARN, 3: ERROR
+METER_LOG_LEVEL="${METER_LOG_LEVEL:-0}"
+case "${METER_LOG_LEVEL}" in
+    [0-3]) ;;
+    *)
+        echo "METER_LOG_LEVEL must be 0, 1, 2 or 3, got '${METER_LOG_LEVEL}'." >&2
+        exit 1;;
+esac
+
 if [ "$machine" = "Mac" ]; then
     PICO_DIR="${1:-/Volumes/CIRCUITPY}"
     cp -r ${THISDIR}/lib/* ${PICO_DIR}/lib/
@@ -27,7 +36,9 @@ fi
 cat <<EOF > "${THISDIR}/settings.toml"
 CIRCUITPY_WIFI_SSID = "${CIRCUITPY_WIFI_SSID:-AUXSPACE-METER}"
 CIRCUITPY_WIFI_PASSWORD = "${CIRCUITPY_WIFI_PASSWORD:-12345678}"
+METER_LOG_LEVEL = ${METER_LOG_LEVEL}
 EOF
 
 
+cp "${THISDIR}/settings.toml" "${PICO_DIR}/"
 cp "${THISDIR}/code.py" "${PICO_DIR}/"
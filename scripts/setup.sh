@@ -28,6 +28,7 @@ trap deactivate EXIT
 
 # Install requirements
 pip3 install \
+    adafruit-circuitpython-asyncio \
     adafruit-circuitpython-bno08x \
     adafruit-circuitpython-dps310 \
     adafruit-circuitpython-register \